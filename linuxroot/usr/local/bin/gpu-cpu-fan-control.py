@@ -1,14 +1,252 @@
 #!/usr/bin/env python3
 
+from __future__ import annotations
+
+import bisect
+import ctypes
+import ctypes.util
+import errno
+import shutil
 import subprocess
+import select
+import selectors
+import socket
+import struct
 import time
 import signal
 import sys
 import logging
+import logging.handlers
 import os
+import queue
+import re
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import pynvml
+except ImportError:
+    pynvml = None
+
+class FreeIpmiSession:
+    """In-process IPMI session to the local BMC through libfreeipmi"""
+    
+    def __init__(self):
+        path = ctypes.util.find_library("freeipmi")
+        if path is None:
+            raise OSError("libfreeipmi not found")
+        
+        lib = ctypes.CDLL(path)
+        lib.ipmi_ctx_create.restype = ctypes.c_void_p
+        lib.ipmi_ctx_create.argtypes = []
+        lib.ipmi_ctx_find_inband.restype = ctypes.c_int
+        lib.ipmi_ctx_find_inband.argtypes = [
+            ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_uint16,
+            ctypes.c_uint8, ctypes.c_char_p, ctypes.c_uint, ctypes.c_uint
+        ]
+        lib.ipmi_cmd_raw.restype = ctypes.c_int
+        lib.ipmi_cmd_raw.argtypes = [
+            ctypes.c_void_p, ctypes.c_uint8, ctypes.c_uint8, ctypes.c_char_p,
+            ctypes.c_uint, ctypes.c_void_p, ctypes.c_uint
+        ]
+        lib.ipmi_ctx_errormsg.restype = ctypes.c_char_p
+        lib.ipmi_ctx_errormsg.argtypes = [ctypes.c_void_p]
+        lib.ipmi_ctx_close.argtypes = [ctypes.c_void_p]
+        lib.ipmi_ctx_destroy.argtypes = [ctypes.c_void_p]
+        
+        self.lib = lib
+        self.ctx = None
+        self.response = ctypes.create_string_buffer(256)
+        self.open()
+    
+    def open(self):
+        """Probe for the in-band driver (KCS/SSIF/OpenIPMI) and keep it open"""
+        ctx = self.lib.ipmi_ctx_create()
+        if not ctx:
+            raise OSError("ipmi_ctx_create failed")
+        if self.lib.ipmi_ctx_find_inband(ctx, None, 0, 0, 0, None, 0, 0) != 1:
+            self.lib.ipmi_ctx_destroy(ctx)
+            raise OSError("no in-band IPMI interface found")
+        self.ctx = ctx
+    
+    def close(self):
+        """Release the driver context"""
+        if self.ctx is not None:
+            self.lib.ipmi_ctx_close(self.ctx)
+            self.lib.ipmi_ctx_destroy(self.ctx)
+            self.ctx = None
+    
+    def raw(self, netfn, data):
+        """Send a raw request (command byte first) and return the response data"""
+        request = bytes(data)
+        
+        # Reopen the context once if the BMC stopped answering
+        for attempt in range(2):
+            if self.ctx is None:
+                self.open()
+            length = self.lib.ipmi_cmd_raw(
+                self.ctx, 0, netfn, request, len(request),
+                self.response, len(self.response)
+            )
+            if length >= 2:
+                break
+            error = self.lib.ipmi_ctx_errormsg(self.ctx).decode(errors="replace")
+            self.close()
+        else:
+            raise OSError(f"IPMI request failed: {error}")
+        
+        completion_code = self.response.raw[1]
+        if completion_code != 0:
+            raise OSError(f"IPMI completion code {completion_code:#04x}")
+        return self.response.raw[2:length]
+
+class ThermalEvents:
+    """Subscription to the kernel's thermal generic netlink event group"""
+    
+    NETLINK_GENERIC = 16
+    SOL_NETLINK = 270
+    NETLINK_ADD_MEMBERSHIP = 1
+    NLMSG_ERROR = 2
+    NLM_F_REQUEST = 1
+    
+    GENL_ID_CTRL = 0x10
+    CTRL_CMD_GETFAMILY = 3
+    CTRL_ATTR_FAMILY_NAME = 2
+    CTRL_ATTR_MCAST_GROUPS = 7
+    CTRL_ATTR_MCAST_GRP_NAME = 1
+    CTRL_ATTR_MCAST_GRP_ID = 2
+    
+    # enum thermal_genl_event: only trip crossings matter for fan control
+    THERMAL_GENL_EVENT_TZ_TRIP_UP = 5
+    THERMAL_GENL_EVENT_TZ_TRIP_DOWN = 6
+    
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, self.NETLINK_GENERIC)
+        try:
+            self.sock.bind((0, 0))
+            group = self.resolve_group(b"thermal", b"event")
+            self.sock.setsockopt(self.SOL_NETLINK, self.NETLINK_ADD_MEMBERSHIP, group)
+            self.sock.setblocking(False)
+        except OSError:
+            self.sock.close()
+            raise
+    
+    @staticmethod
+    def attrs(data):
+        """Yield (type, payload) for each netlink attribute in data"""
+        offset = 0
+        while offset + 4 <= len(data):
+            length, kind = struct.unpack_from("=HH", data, offset)
+            if length < 4:
+                break
+            yield kind & 0x3fff, data[offset + 4:offset + length]
+            offset += (length + 3) & ~3
+    
+    def resolve_group(self, family, group):
+        """Look up the multicast group id of a generic netlink family"""
+        name = family + b"\0"
+        attr = struct.pack("=HH", 4 + len(name), self.CTRL_ATTR_FAMILY_NAME) + name
+        attr += b"\0" * (-len(attr) % 4)
+        payload = struct.pack("=BBH", self.CTRL_CMD_GETFAMILY, 1, 0) + attr
+        header = struct.pack("=IHHII", 16 + len(payload), self.GENL_ID_CTRL, self.NLM_F_REQUEST, 1, 0)
+        self.sock.send(header + payload)
+        
+        reply = self.sock.recv(65536)
+        length, kind = struct.unpack_from("=IH", reply)
+        if kind == self.NLMSG_ERROR:
+            error = -struct.unpack_from("=i", reply, 16)[0]
+            raise OSError(error, f"netlink family {family.decode()} not available")
+        
+        # Skip nlmsghdr (16 bytes) and genlmsghdr (4 bytes)
+        for kind, value in self.attrs(reply[20:length]):
+            if kind != self.CTRL_ATTR_MCAST_GROUPS:
+                continue
+            for _, entry in self.attrs(value):
+                fields = dict(self.attrs(entry))
+                if fields.get(self.CTRL_ATTR_MCAST_GRP_NAME, b"").rstrip(b"\0") == group:
+                    return struct.unpack_from("=I", fields[self.CTRL_ATTR_MCAST_GRP_ID])[0]
+        raise OSError(f"netlink group {family.decode()}/{group.decode()} not found")
+    
+    def fileno(self):
+        return self.sock.fileno()
+    
+    def drain(self):
+        """Read all queued event messages and return how many were trip crossings"""
+        trips = 0
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                return trips
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                # Events were dropped, any of them may have been a trip crossing
+                trips += 1
+                continue
+            
+            # Each message is an nlmsghdr (16 bytes) followed by the genlmsghdr cmd byte
+            offset = 0
+            while offset + 17 <= len(data):
+                length = struct.unpack_from("=I", data, offset)[0]
+                if length < 17:
+                    break
+                if data[offset + 16] in (self.THERMAL_GENL_EVENT_TZ_TRIP_UP,
+                                         self.THERMAL_GENL_EVENT_TZ_TRIP_DOWN):
+                    trips += 1
+                offset += (length + 3) & ~3
+    
+    def close(self):
+        self.sock.close()
+
+class RepeatFilter(logging.Filter):
+    """Collapse identical consecutive log lines into one summary per window"""
+    
+    def __init__(self, handler, window=60):
+        super().__init__()
+        self.handler = handler
+        self.window = window
+        self.last_message = None
+        self.last_emitted = 0.0
+        self.last_repeat = None
+        self.repeats = 0
+    
+    def filter(self, record):
+        message = record.getMessage()
+        
+        if message == self.last_message:
+            self.repeats += 1
+            self.last_repeat = record
+            
+            # Window elapsed: write one summary line for the repeats so far
+            if record.created - self.last_emitted >= self.window:
+                self.flush()
+                self.last_emitted = record.created
+            return False
+        
+        self.flush()
+        self.last_message = message
+        self.last_emitted = record.created
+        return True
+    
+    def flush(self):
+        """Write the summary for repeats that have not been reported yet"""
+        if not self.repeats:
+            return
+        
+        # The record is shared with other handlers, so summarize in a copy
+        summary = logging.makeLogRecord(self.last_repeat.__dict__)
+        summary.msg = "%s (repeated %d times)"
+        summary.args = (self.last_message, self.repeats)
+        self.repeats = 0
+        
+        # emit() directly, handle() would run this filter again
+        self.handler.acquire()
+        try:
+            self.handler.emit(summary)
+        finally:
+            self.handler.release()
+
 class FanController:
     def __init__(self):
         # Configuration
@@ -30,17 +268,59 @@ class FanController:
         self.UTIL_LOW = 30
         self.UTIL_HIGH = 70
         
+        # Stepping down needs temperatures this far below the threshold
+        self.TEMP_HYSTERESIS = 2
+        
+        # Minimum seconds between a fan change and the next step down
+        self.MIN_DWELL = 15
+        
         # Fan speeds in hex
         self.FAN_DEFAULT = 0x20    # 50%
         self.FAN_MEDIUM = 0x32     # 78%
         self.FAN_HIGH = 0x48       # 113%
         self.FAN_MAX = 0x64        # 156%
         
+        # Threshold decision table, built once from the constants above
+        self.build_decision_table()
+        
+        # IPMI requests, built once for the handful of speeds we ever set
+        self.build_ipmi_requests()
+        
+        # Lower priority before any thread starts; threads and children inherit it
+        priority_error = self.lower_priority()
+        
         # Setup logging
         self.setup_logging()
+        if priority_error is not None:
+            self.logger.warning("Failed to lower scheduling priority: %s", priority_error)
         
         # Current fan speed tracking
         self.current_speed = self.FAN_DEFAULT
+        self.last_transition = 0.0
+        
+        # In-process IPMI session, None falls back to ipmitool
+        self.ipmi = None
+        
+        # Cached NVML device handles, None falls back to nvidia-smi
+        self.gpu_handles = None
+        
+        # Persistent nvidia-smi process streaming GPU samples
+        self.gpu_stream = None
+        self.gpu_buffer = b""
+        self.gpu_pending = None
+        self.gpu_last = None
+        
+        # One "temperature, utilization" sample per GPU line from nvidia-smi
+        self.gpu_sample_re = re.compile(rb"(\d+), *(\d+)")
+        
+        # Thermal zone temp files, opened once and re-read with pread
+        self.thermal_fds = self.open_thermal_zones()
+        
+        # Kernel thermal trip notifications, None falls back to plain polling
+        self.thermal_events = None
+        
+        # Event sources the control loop waits on between ticks
+        self.selector = selectors.DefaultSelector()
         
         # Setup signal handlers for graceful shutdown
         signal.signal(signal.SIGINT, self.cleanup)
@@ -53,189 +333,506 @@ class FanController:
         # Create log directory if it doesn't exist
         os.makedirs(os.path.dirname(log_file), exist_ok=True)
         
+        # File and stdout writes happen on a listener thread, off the control loop
+        formatter = logging.Formatter('%(asctime)s - %(message)s')
+        file_handler = logging.FileHandler(log_file)
+        handlers = [
+            file_handler,
+            logging.StreamHandler(sys.stdout)
+        ]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        
+        # Steady-state repeats become one line a minute in the log file
+        self.repeat_filter = RepeatFilter(file_handler)
+        file_handler.addFilter(self.repeat_filter)
+        
+        log_queue = queue.SimpleQueue()
+        self.log_listener = logging.handlers.QueueListener(log_queue, *handlers)
+        self.log_listener.start()
+        
+        # The queue only carries the merged message, the listener adds the timestamp
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.setFormatter(logging.Formatter('%(message)s'))
+        
         # Configure logging
         logging.basicConfig(
             level=logging.INFO,
-            format='%(asctime)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file),
-                logging.StreamHandler(sys.stdout)
-            ]
+            handlers=[queue_handler]
         )
         self.logger = logging.getLogger(__name__)
     
+    def stop_logging(self):
+        """Flush queued records and any pending repeat summary"""
+        self.log_listener.stop()
+        self.repeat_filter.flush()
+    
     def check_commands(self):
         """Ensure required commands are available"""
-        required_commands = ['ipmitool', 'nvidia-smi']
+        required_commands = []
+        if self.gpu_handles is None:
+            required_commands.append('nvidia-smi')
+        if self.ipmi is None:
+            required_commands.append('ipmitool')
         
         for cmd in required_commands:
-            try:
-                subprocess.run(['which', cmd], check=True, capture_output=True)
-            except subprocess.CalledProcessError:
-                self.logger.error(f"Error: {cmd} is required but not installed.")
+            if shutil.which(cmd) is None:
+                self.logger.error("Error: %s is required but not installed.", cmd)
                 if cmd == 'ipmitool':
                     self.logger.error("Install with: sudo apt-get install ipmitool")
                 elif cmd == 'nvidia-smi':
                     self.logger.error("Install NVIDIA drivers")
+                self.stop_logging()
                 sys.exit(1)
     
-    def run_command(self, command, capture_output=True):
-        """Run a shell command and return the result"""
+    def run_command(self, argv, capture_output=True, input=None):
+        """Run a command (argv list, no shell) and return the result"""
         try:
             result = subprocess.run(
-                command, 
-                shell=True, 
+                argv, 
+                shell=False, 
                 capture_output=capture_output, 
+                input=input, 
                 text=True, 
                 check=True
             )
             return result.stdout.strip() if capture_output else None
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"Command failed: {command}")
-            self.logger.error(f"Error: {e}")
+        except (subprocess.CalledProcessError, OSError) as e:
+            self.logger.error("Command failed: %s", ' '.join(argv))
+            self.logger.error("Error: %s", e)
             return None
     
+    def open_ipmi(self):
+        """Open a persistent IPMI session, falling back to ipmitool"""
+        try:
+            self.ipmi = FreeIpmiSession()
+            self.logger.info("Using in-process IPMI session (libfreeipmi)")
+        except OSError as e:
+            self.ipmi = None
+            self.logger.info("libfreeipmi unavailable (%s), using ipmitool", e)
+    
+    def build_ipmi_requests(self):
+        """Precompute every raw IPMI request (netfn, command, data...) we send"""
+        self.IPMI_MANUAL = (0x30, 0x30, 0x01, 0x00)
+        self.IPMI_AUTO = (0x30, 0x30, 0x01, 0x01)
+        
+        # Fan speed -> (set-speed request, percentage for the log)
+        self.speed_table = {
+            speed: ((0x30, 0x30, 0x02, 0xff, speed), (speed / 0x64) * 100)
+            for speed in (self.FAN_DEFAULT, self.FAN_MEDIUM, self.FAN_HIGH, self.FAN_MAX)
+        }
+        
+        # Matching ipmitool command lines for the fallback path
+        requests = [self.IPMI_MANUAL, self.IPMI_AUTO]
+        requests += [request for request, _ in self.speed_table.values()]
+        self.ipmitool_argv = {
+            request: ["ipmitool", "raw"] + [f"{b:#04x}" for b in request]
+            for request in requests
+        }
+        
+        # Same requests as lines of an "ipmitool exec" script
+        self.ipmitool_lines = {
+            request: " ".join(argv[1:]) + "\n"
+            for request, argv in self.ipmitool_argv.items()
+        }
+    
+    def ipmi_raw(self, request):
+        """Send a raw IPMI request over the open session or through ipmitool"""
+        if self.ipmi is not None:
+            self.ipmi.raw(request[0], request[1:])
+        else:
+            self.run_command(self.ipmitool_argv[request], capture_output=False)
+    
+    def ipmi_raw_batch(self, *requests):
+        """Send several raw IPMI requests, using one ipmitool process when forking"""
+        if self.ipmi is not None:
+            for request in requests:
+                self.ipmi.raw(request[0], request[1:])
+        else:
+            script = "".join(self.ipmitool_lines[request] for request in requests)
+            self.run_command(["ipmitool", "exec", "/dev/stdin"], capture_output=False, input=script)
+    
     def set_fan_speed(self, speed_hex, reason):
         """Set fan speed using IPMI commands"""
         try:
-            # Enable manual fan control
-            self.run_command("ipmitool raw 0x30 0x30 0x01 0x00", capture_output=False)
+            request, percentage = self.speed_table[speed_hex]
             
-            # Set fan speed
-            self.run_command(f"ipmitool raw 0x30 0x30 0x02 0xff {speed_hex:#04x}", capture_output=False)
+            # Enable manual fan control, then set fan speed
+            self.ipmi_raw_batch(self.IPMI_MANUAL, request)
             
-            percentage = (speed_hex / 0x64) * 100
-            self.logger.info(f"Fan speed set to {percentage:.0f}% ({reason})")
+            self.logger.info("Fan speed set to %.0f%% (%s)", percentage, reason)
             self.current_speed = speed_hex
+            self.last_transition = time.monotonic()
             
         except Exception as e:
-            self.logger.error(f"Failed to set fan speed: {e}")
+            self.logger.error("Failed to set fan speed: %s", e)
     
     def restore_auto_fan(self):
         """Return to automatic fan control"""
         try:
-            self.run_command("ipmitool raw 0x30 0x30 0x01 0x01", capture_output=False)
+            self.ipmi_raw(self.IPMI_AUTO)
             self.logger.info("Restored automatic fan control")
         except Exception as e:
-            self.logger.error(f"Failed to restore automatic fan control: {e}")
+            self.logger.error("Failed to restore automatic fan control: %s", e)
     
     def cleanup(self, signum=None, frame=None):
         """Graceful shutdown handler"""
         self.logger.info("Caught signal, restoring automatic fan control...")
         self.restore_auto_fan()
+        self.stop_gpu_stream()
+        if self.gpu_handles is not None:
+            pynvml.nvmlShutdown()
+        if self.ipmi is not None:
+            self.ipmi.close()
+        for fd in self.thermal_fds:
+            os.close(fd)
+        if self.thermal_events is not None:
+            self.thermal_events.close()
+        self.stop_logging()
         sys.exit(0)
     
-    def get_cpu_temp(self):
+    def open_thermal_zones(self):
+        """Open every thermal zone temp file once for the lifetime of the daemon"""
+        # These stay plain fds read with pread: sysfs text attributes are generated
+        # on read and kernfs rejects mmap on them with ENODEV
+        fds = []
+        for zone in sorted(Path("/sys/class/thermal").glob("thermal_zone*/temp")):
+            try:
+                fds.append(os.open(zone, os.O_RDONLY))
+            except OSError:
+                continue
+        return fds
+    
+    def subscribe_thermal_events(self):
+        """Wake the control loop early when a thermal zone crosses a trip point"""
+        try:
+            self.thermal_events = ThermalEvents()
+        except OSError as e:
+            self.logger.info("Thermal netlink events unavailable (%s), polling only", e)
+            return
+        
+        self.selector.register(self.thermal_events, selectors.EVENT_READ, self.read_thermal_events)
+        self.logger.info("Subscribed to thermal netlink events")
+    
+    def read_thermal_events(self):
+        """Drain trip notifications, True if the fan speed should be re-evaluated"""
+        if self.thermal_events.drain():
+            self.logger.debug("Thermal trip event, re-evaluating fan speed")
+            return True
+        return False
+    
+    def wait_for_tick(self):
+        """Handle event sources until the next tick or until one asks for re-evaluation"""
+        # Ticks follow a fixed schedule, so slow passes don't push later ones back
+        now = time.monotonic()
+        if self.next_tick <= now:
+            self.next_tick += self.INTERVAL
+            if self.next_tick <= now:
+                # Fell a whole interval behind, resync rather than catch up
+                self.next_tick = now
+        
+        while True:
+            remaining = self.next_tick - time.monotonic()
+            if remaining <= 0:
+                return
+            
+            # A callback returns True when the fan speed must be re-evaluated early
+            for key, _ in self.selector.select(remaining):
+                if key.data():
+                    return
+    
+    def get_cpu_temp(self) -> int:
         """Get maximum CPU temperature"""
         max_temp = 0
         
         # Method 1: Read from thermal zones (most reliable)
-        thermal_zones = Path("/sys/class/thermal").glob("thermal_zone*/temp")
-        
-        for zone in thermal_zones:
+        # sysfs regenerates the value on every read from offset 0
+        for fd in self.thermal_fds:
             try:
-                with open(zone, 'r') as f:
-                    temp_millidegrees = int(f.read().strip())
-                    temp_celsius = temp_millidegrees // 1000
-                    if temp_celsius > max_temp:
-                        max_temp = temp_celsius
-            except (FileNotFoundError, ValueError, PermissionError):
+                # int() parses the raw bytes directly, trailing newline included
+                temp_millidegrees = int(os.pread(fd, 16, 0))
+                temp_celsius = temp_millidegrees // 1000
+                if temp_celsius > max_temp:
+                    max_temp = temp_celsius
+            except (OSError, ValueError):
                 continue
         
         # Method 2: Fallback to sensors command if thermal zones failed
         if max_temp == 0:
             try:
-                sensors_output = self.run_command("sensors")
-                if sensors_output:
-                    # Look for Package temperatures
-                    lines = sensors_output.split('\n')
-                    for line in lines:
-                        if "Package id" in line and "°C" in line:
-                            # Extract temperature value
-                            temp_str = line.split('+')[1].split('°C')[0]
-                            temp = int(float(temp_str))
+                # Stream the raw (-u) output line by line instead of buffering it
+                with subprocess.Popen(
+                    ["sensors", "-u"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL
+                ) as proc:
+                    in_package = False
+                    for line in proc.stdout:
+                        # Chip and feature headers are unindented, values are indented
+                        if not line.startswith(b" "):
+                            in_package = line.startswith(b"Package id")
+                        
+                        # Look for Package temperatures (every socket, so no early exit)
+                        elif in_package and b"_input:" in line:
+                            temp = int(float(line.split(b":")[1]))
                             if temp > max_temp:
                                 max_temp = temp
             except Exception as e:
-                self.logger.warning(f"Failed to get CPU temperature from sensors: {e}")
+                self.logger.warning("Failed to get CPU temperature from sensors: %s", e)
         
         return max_temp
     
-    def get_gpu_data(self):
+    def open_nvml(self):
+        """Initialize NVML once and cache the device handles"""
+        if pynvml is None:
+            self.logger.info("pynvml not installed, using nvidia-smi")
+            return
+        
+        try:
+            pynvml.nvmlInit()
+            handles = [
+                pynvml.nvmlDeviceGetHandleByIndex(i)
+                for i in range(pynvml.nvmlDeviceGetCount())
+            ]
+        except pynvml.NVMLError as e:
+            self.logger.info("NVML unavailable (%s), using nvidia-smi", e)
+            return
+        
+        if not handles:
+            pynvml.nvmlShutdown()
+            self.logger.info("NVML found no GPUs, using nvidia-smi")
+            return
+        
+        self.gpu_handles = handles
+        self.logger.info("Using NVML for %d GPU(s)", len(handles))
+        
+        # Without persistence mode the driver re-initializes on every query
+        for index, handle in enumerate(handles):
+            try:
+                if pynvml.nvmlDeviceGetPersistenceMode(handle) != pynvml.NVML_FEATURE_ENABLED:
+                    pynvml.nvmlDeviceSetPersistenceMode(handle, pynvml.NVML_FEATURE_ENABLED)
+                    self.logger.info("Enabled persistence mode on GPU %d", index)
+            except pynvml.NVMLError as e:
+                self.logger.warning(
+                    "Could not enable persistence mode on GPU %d (%s), "
+                    "run nvidia-persistenced to avoid slow queries", index, e
+                )
+    
+    def start_gpu_stream(self):
+        """Start a long-lived nvidia-smi that prints a sample every INTERVAL"""
+        self.gpu_stream = subprocess.Popen(
+            [
+                "nvidia-smi",
+                "--query-gpu=temperature.gpu,utilization.gpu",
+                "--format=csv,noheader,nounits",
+                "-lms", str(self.INTERVAL * 1000),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        os.set_blocking(self.gpu_stream.stdout.fileno(), False)
+        self.gpu_buffer = b""
+        self.selector.register(self.gpu_stream.stdout, selectors.EVENT_READ, self.read_gpu_stream)
+    
+    def stop_gpu_stream(self):
+        """Terminate the nvidia-smi stream process"""
+        if self.gpu_stream is None:
+            return
+        self.selector.unregister(self.gpu_stream.stdout)
+        try:
+            self.gpu_stream.terminate()
+            self.gpu_stream.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.gpu_stream.kill()
+        self.gpu_stream.stdout.close()
+        self.gpu_stream = None
+    
+    def read_gpu_stream(self) -> bool:
+        """Fold every sample nvidia-smi has written so far into gpu_pending"""
+        fd = self.gpu_stream.stdout.fileno()
+        
+        # Samples only accumulate here, the scheduled tick evaluates them
+        while True:
+            try:
+                chunk = os.read(fd, 4096)
+            except BlockingIOError:
+                return False
+            
+            if not chunk:
+                self.logger.error("nvidia-smi exited, restarting GPU stream")
+                self.stop_gpu_stream()
+                return False
+            
+            # Keep any trailing partial line for the next read
+            data = self.gpu_buffer + chunk
+            end = data.rfind(b'\n') + 1
+            self.gpu_buffer = data[end:]
+            
+            # Lines like "[N/A], 5" simply don't match and are skipped
+            matches = self.gpu_sample_re.findall(data, 0, end)
+            if not matches:
+                continue
+            
+            # Take the maximum over every sample seen since the last tick
+            temps, utils = zip(*matches)
+            max_temp = max(map(int, temps))
+            max_util = max(map(int, utils))
+            if self.gpu_pending is not None:
+                max_temp = max(max_temp, self.gpu_pending[0])
+                max_util = max(max_util, self.gpu_pending[1])
+            self.gpu_pending = (max_temp, max_util)
+    
+    def get_gpu_data(self) -> tuple[int, int]:
         """Get GPU temperature and utilization data"""
         try:
-            output = self.run_command(
-                "nvidia-smi --query-gpu=temperature.gpu,utilization.gpu --format=csv,noheader,nounits"
-            )
+            if self.gpu_handles is not None:
+                max_temp = max(
+                    pynvml.nvmlDeviceGetTemperature(h, pynvml.NVML_TEMPERATURE_GPU)
+                    for h in self.gpu_handles
+                )
+                max_util = max(
+                    pynvml.nvmlDeviceGetUtilizationRates(h).gpu
+                    for h in self.gpu_handles
+                )
+                return max_temp, max_util
             
-            if not output:
-                return 0, 0
+            if self.gpu_stream is None:
+                self.start_gpu_stream()
+                
+            # Block for the very first sample so the initial decision has real data
+            if self.gpu_last is None and self.gpu_pending is None:
+                select.select([self.gpu_stream.stdout], [], [], self.INTERVAL)
             
-            max_temp = 0
-            max_util = 0
+            # Pick up anything written since the selector last looked
+            self.read_gpu_stream()
             
-            for line in output.split('\n'):
-                if line.strip():
-                    parts = line.split(',')
-                    if len(parts) >= 2:
-                        temp = int(parts[0].strip())
-                        util = int(parts[1].strip())
-                        
-                        if temp > max_temp:
-                            max_temp = temp
-                        if util > max_util:
-                            max_util = util
+            if self.gpu_pending is not None:
+                self.gpu_last = self.gpu_pending
+                self.gpu_pending = None
             
-            return max_temp, max_util
+            return self.gpu_last or (0, 0)
             
         except Exception as e:
-            self.logger.error(f"Failed to get GPU data: {e}")
+            self.logger.error("Failed to get GPU data: %s", e)
             return 0, 0
     
-    def determine_fan_speed(self, gpu_temp, cpu_temp, gpu_util):
-        """Determine appropriate fan speed based on temperatures and utilization"""
+    def build_decision_table(self):
+        """Precompute the fan decision for every (GPU, CPU, utilization) band"""
+        self.gpu_edges = [self.GPU_TEMP_LOW, self.GPU_TEMP_MEDIUM, self.GPU_TEMP_HIGH, self.GPU_TEMP_CRITICAL]
+        self.cpu_edges = [self.CPU_TEMP_LOW, self.CPU_TEMP_MEDIUM, self.CPU_TEMP_HIGH, self.CPU_TEMP_CRITICAL]
+        self.util_edges = [self.UTIL_LOW, self.UTIL_HIGH]
         
-        # Critical temperature check
-        if gpu_temp >= self.GPU_TEMP_CRITICAL or cpu_temp >= self.CPU_TEMP_CRITICAL:
-            return self.FAN_MAX, f"CRITICAL temperature (GPU: {gpu_temp}°C, CPU: {cpu_temp}°C)"
+        def representatives(edges):
+            # One value inside each band: below the first edge, then each edge itself
+            return [edges[0] - 1] + edges
         
-        # High temperature check
-        elif gpu_temp >= self.GPU_TEMP_HIGH or cpu_temp >= self.CPU_TEMP_HIGH:
-            return self.FAN_HIGH, f"HIGH temperature (GPU: {gpu_temp}°C, CPU: {cpu_temp}°C)"
+        # Entries are (speed, reason); speed None means keep the current level
+        self.decision_table = {}
+        for g, gpu_temp in enumerate(representatives(self.gpu_edges)):
+            for c, cpu_temp in enumerate(representatives(self.cpu_edges)):
+                for u, gpu_util in enumerate(representatives(self.util_edges)):
+                    
+                    # Critical temperature check
+                    if gpu_temp >= self.GPU_TEMP_CRITICAL or cpu_temp >= self.CPU_TEMP_CRITICAL:
+                        entry = (self.FAN_MAX, "CRITICAL temperature (GPU: {0}°C, CPU: {1}°C)")
+                    
+                    # High temperature check
+                    elif gpu_temp >= self.GPU_TEMP_HIGH or cpu_temp >= self.CPU_TEMP_HIGH:
+                        entry = (self.FAN_HIGH, "HIGH temperature (GPU: {0}°C, CPU: {1}°C)")
+                    
+                    # Medium temperature or high utilization check
+                    elif (gpu_temp >= self.GPU_TEMP_MEDIUM or 
+                          cpu_temp >= self.CPU_TEMP_MEDIUM or 
+                          gpu_util >= self.UTIL_HIGH):
+                        entry = (self.FAN_MEDIUM, "MEDIUM temperature or HIGH utilization")
+                    
+                    # Low temperature and utilization
+                    elif (gpu_temp < self.GPU_TEMP_LOW and 
+                          cpu_temp < self.CPU_TEMP_LOW and 
+                          gpu_util < self.UTIL_LOW):
+                        entry = (self.FAN_DEFAULT, "LOW temperatures and utilization")
+                    
+                    # Maintain current level if in middle ranges
+                    else:
+                        entry = (None, "maintaining current level")
+                    
+                    self.decision_table[(g, c, u)] = entry
+    
+    def lookup_fan_speed(self, gpu_temp: int, cpu_temp: int, gpu_util: int) -> tuple[int, str]:
+        """Look up the table decision (speed, reason template) for a single set of readings"""
+        speed, reason = self.decision_table[(
+            bisect.bisect_right(self.gpu_edges, gpu_temp),
+            bisect.bisect_right(self.cpu_edges, cpu_temp),
+            bisect.bisect_right(self.util_edges, gpu_util),
+        )]
         
-        # Medium temperature or high utilization check
-        elif (gpu_temp >= self.GPU_TEMP_MEDIUM or 
-              cpu_temp >= self.CPU_TEMP_MEDIUM or 
-              gpu_util >= self.UTIL_HIGH):
-            return self.FAN_MEDIUM, "MEDIUM temperature or HIGH utilization"
+        if speed is None:
+            return self.current_speed, reason
+        return speed, reason
+    
+    def determine_fan_speed(self, gpu_temp: int, cpu_temp: int, gpu_util: int) -> tuple[int, str]:
+        """Determine appropriate fan speed based on temperatures and utilization"""
+        speed, reason = self.lookup_fan_speed(gpu_temp, cpu_temp, gpu_util)
         
-        # Low temperature and utilization
-        elif (gpu_temp < self.GPU_TEMP_LOW and 
-              cpu_temp < self.CPU_TEMP_LOW and 
-              gpu_util < self.UTIL_LOW):
-            return self.FAN_DEFAULT, "LOW temperatures and utilization"
+        # Stepping up (including to critical) always happens immediately
+        if speed >= self.current_speed:
+            return speed, reason.format(gpu_temp, cpu_temp)
         
-        # Maintain current level if in middle ranges
-        else:
-            return self.current_speed, "maintaining current level"
+        # Leaving a band requires falling TEMP_HYSTERESIS below its threshold
+        speed, reason = self.lookup_fan_speed(
+            gpu_temp + self.TEMP_HYSTERESIS,
+            cpu_temp + self.TEMP_HYSTERESIS,
+            gpu_util
+        )
+        if speed >= self.current_speed:
+            return self.current_speed, "maintaining current level (hysteresis)"
+        
+        # Don't step down again until the last change has had time to settle
+        if time.monotonic() - self.last_transition < self.MIN_DWELL:
+            return self.current_speed, "maintaining current level (dwell time)"
+        
+        # The shifted lookup only picks the speed, report the real readings
+        return speed, reason.format(gpu_temp, cpu_temp)
+    
+    def lower_priority(self):
+        """Pin to a single CPU and yield to every other workload, returns any error"""
+        # These calls only affect the calling thread, so this runs before logging starts
+        try:
+            # Stay on one core so wakeups find warm caches
+            os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+            os.sched_setscheduler(0, os.SCHED_BATCH, os.sched_param(0))
+            os.nice(19)
+        except OSError as e:
+            return e
+        return None
     
     def run(self):
         """Main control loop"""
+        self.open_ipmi()
+        self.open_nvml()
         self.check_commands()
         
         self.logger.info("Starting GPU/CPU fan control script")
         
+        # Without NVML, stream GPU samples from a single nvidia-smi process
+        if self.gpu_handles is None:
+            self.start_gpu_stream()
+        self.subscribe_thermal_events()
+        
         # Set initial fan speed
         self.set_fan_speed(self.current_speed, "initial setting")
         
+        self.next_tick = time.monotonic()
+        
         try:
             while True:
                 # Get current system temperatures and GPU utilization
                 gpu_temp, gpu_util = self.get_gpu_data()
                 cpu_temp = self.get_cpu_temp()
                 
-                self.logger.info(
-                    f"System temperatures: GPU={gpu_temp}°C, CPU={cpu_temp}°C, GPU util={gpu_util}%"
+                self.logger.debug(
+                    "System temperatures: GPU=%d°C, CPU=%d°C, GPU util=%d%%",
+                    gpu_temp, cpu_temp, gpu_util
                 )
                 
                 # Determine new fan speed
@@ -246,12 +843,12 @@ class FanController:
                     self.set_fan_speed(new_speed, reason)
                 
                 # Wait for next check
-                time.sleep(self.INTERVAL)
+                self.wait_for_tick()
                 
         except KeyboardInterrupt:
             self.cleanup()
         except Exception as e:
-            self.logger.error(f"Unexpected error: {e}")
+            self.logger.error("Unexpected error: %s", e)
             self.cleanup()
 
 def main():